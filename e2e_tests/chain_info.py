@@ -1,28 +1,40 @@
 from dataclasses import dataclass
+from typing import Optional
 from hexbytes import HexBytes
 from taiko_inbox import get_last_batch_id
-from utils import get_slot_in_epoch
+from utils import get_slot_in_epoch, run_parallel
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ChainInfo:
     """Chain Info"""
     # Forced inclusion sender nonce
-    fi_sender_nonce: int
-    batch_id: int
-    block_number: int
-    block_hash: HexBytes
+    fi_sender_nonce: Optional[int]
+    batch_id: Optional[int]
+    block_number: Optional[int]
+    block_hash: Optional[HexBytes]
 
     @classmethod
     def from_chain(cls, fi_account_address, l2_client_node1, l1_client, env_vars, beacon_client, verbose: bool = True):
         """Create ChainInfo instance from current chain state"""
-        fi_sender_nonce = l2_client_node1.eth.get_transaction_count(fi_account_address)
-        batch_id = get_last_batch_id(l1_client, env_vars)
-        block_number = l2_client_node1.eth.block_number
-        block_hash = l2_client_node1.eth.get_block(block_number).hash
+        def read_l2():
+            # Both L2 reads go to the same node, send them as one JSON-RPC batch
+            with l2_client_node1.batch_requests() as batch:
+                batch.add(l2_client_node1.eth.get_transaction_count(fi_account_address))
+                batch.add(l2_client_node1.eth.get_block('latest'))
+                return batch.execute()
+
+        # Independent reads on different endpoints, issue them concurrently
+        (fi_sender_nonce, block), batch_id, slot_in_epoch = run_parallel(
+            read_l2,
+            lambda: get_last_batch_id(l1_client, env_vars),
+            lambda: get_slot_in_epoch(beacon_client) if verbose else None,
+        )
+        block_number = block.number
+        block_hash = block.hash
 
         if verbose:
             print("----------------")
-            print("Slot in epoch:", get_slot_in_epoch(beacon_client))
+            print("Slot in epoch:", slot_in_epoch)
             print("FI sender nonce:", fi_sender_nonce)
             print("Batch ID:", batch_id)
             print("Block number:", block_number)
@@ -35,6 +47,23 @@ class ChainInfo:
             block_hash=block_hash
         )
 
+    @classmethod
+    def snapshot_nonce_only(cls, fi_account_address, l2_client_node1):
+        """Partial snapshot with only the forced inclusion sender nonce, other fields are None"""
+        fi_sender_nonce = l2_client_node1.eth.get_transaction_count(fi_account_address)
+        print("----------------")
+        print("FI sender nonce:", fi_sender_nonce)
+        return cls(fi_sender_nonce=fi_sender_nonce, batch_id=None, block_number=None, block_hash=None)
+
+    @classmethod
+    def snapshot_block_only(cls, l2_client_node1):
+        """Partial snapshot with only the latest block number and hash, enough for check_reorg"""
+        block = l2_client_node1.eth.get_block('latest')
+        print("----------------")
+        print("Block number:", block.number)
+        print("Block hash:", block.hash.hex())
+        return cls(fi_sender_nonce=None, batch_id=None, block_number=block.number, block_hash=block.hash)
+
     def check_reorg(self, l2_client_node1):
         """Verify that the cached block hash matches the current chain state (detect reorgs)."""
         latest_block_number = l2_client_node1.eth.block_number
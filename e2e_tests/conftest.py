@@ -3,15 +3,34 @@ from web3 import Web3
 from web3.beacon import Beacon
 from eth_account import Account
 import os
-import time
 from dotenv import load_dotenv
-from utils import ensure_catalyst_node_running, spam_n_blocks, forced_inclusion_store_is_empty, check_empty_forced_inclusion_store, get_current_operator
-from dataclasses import dataclass
-from taiko_inbox import get_last_block_id
 
+# Before importing utils, which reads its tuning knobs from the environment at import time
 load_dotenv()
 
-@dataclass
+from utils import ensure_catalyst_node_running, spam_n_blocks, forced_inclusion_store_is_empty, check_empty_forced_inclusion_store, get_current_operator, run_parallel, sleep_with_backoff, POLL_INITIAL_DELAY_SEC, set_ws_url, get_ws_url, get_stopped_catalyst_nodes, wait_for_operator_added_event, OPERATOR_EVENT_TIMEOUT_SEC, HTTP_SESSION, set_preconf_heartbeat_ms
+from dataclasses import dataclass, field
+from taiko_inbox import get_last_block_id
+
+def _non_zero_int(value):
+    value = int(value)
+    return value if value else None
+
+# (environment variable, field name, parser)
+_ENV_VARS_SCHEMA = (
+    ("TEST_L2_PREFUNDED_PRIVATE_KEY", "l2_prefunded_priv_key", str),
+    ("TEST_L2_PREFUNDED_PRIVATE_KEY_2", "l2_prefunded_priv_key_2", str),
+    ("TAIKO_INBOX_ADDRESS", "taiko_inbox_address", str),
+    ("PRECONF_WHITELIST_ADDRESS", "preconf_whitelist_address", str),
+    ("FORCED_INCLUSION_STORE_ADDRESS", "forced_inclusion_store_address", str),
+    ("PRECONF_MIN_TXS", "preconf_min_txs", int),
+    ("PRECONF_HEARTBEAT_MS", "preconf_heartbeat_ms", _non_zero_int),
+    ("L2_PRIVATE_KEY", "l2_private_key", str),
+    ("MAX_BLOCKS_PER_BATCH", "max_blocks_per_batch", _non_zero_int),
+    ("PROTOCOL", "protocol", str),
+)
+
+@dataclass(frozen=True, slots=True)
 class EnvVars:
     """Centralized environment variables"""
     l2_prefunded_priv_key: str
@@ -24,97 +43,93 @@ class EnvVars:
     l2_private_key: str
     max_blocks_per_batch: int
     protocol: str
+    _is_pacaya: bool = field(init=False, repr=False)
+    _is_shasta: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_is_pacaya", self.protocol == "pacaya")
+        object.__setattr__(self, "_is_shasta", self.protocol == "shasta")
 
     @classmethod
     def from_env(cls):
         """Create EnvVars instance from environment variables"""
-        l2_prefunded_priv_key = os.getenv("TEST_L2_PREFUNDED_PRIVATE_KEY")
-        if not l2_prefunded_priv_key:
-            raise Exception("Environment variable TEST_L2_PREFUNDED_PRIVATE_KEY not set")
-
-        l2_prefunded_priv_key_2 = os.getenv("TEST_L2_PREFUNDED_PRIVATE_KEY_2")
-        if not l2_prefunded_priv_key_2:
-            raise Exception("Environment variable TEST_L2_PREFUNDED_PRIVATE_KEY_2 not set")
-
-        taiko_inbox_address = os.getenv("TAIKO_INBOX_ADDRESS")
-        if not taiko_inbox_address:
-            raise Exception("Environment variable TAIKO_INBOX_ADDRESS not set")
-
-        preconf_whitelist_address = os.getenv("PRECONF_WHITELIST_ADDRESS")
-        if not preconf_whitelist_address:
-            raise Exception("Environment variable PRECONF_WHITELIST_ADDRESS not set")
-
-        forced_inclusion_store_address = os.getenv("FORCED_INCLUSION_STORE_ADDRESS")
-        if not forced_inclusion_store_address:
-            raise Exception("Environment variable FORCED_INCLUSION_STORE_ADDRESS not set")
-
-        preconf_min_txs = os.getenv("PRECONF_MIN_TXS")
-        if preconf_min_txs is None:
-            raise Exception("PRECONF_MIN_TXS is not set")
-        preconf_min_txs = int(preconf_min_txs)
-
-        preconf_heartbeat_ms = int(os.getenv("PRECONF_HEARTBEAT_MS", "0"))
-        if not preconf_heartbeat_ms:
-            raise Exception("Environment variable PRECONF_HEARTBEAT_MS not set")
-
-        l2_private_key = os.getenv("L2_PRIVATE_KEY")
-        if not l2_private_key:
-            raise Exception("Environment variable L2_PRIVATE_KEY not set")
-
-        max_blocks_per_batch = int(os.getenv("MAX_BLOCKS_PER_BATCH", "0"))
-        if not max_blocks_per_batch:
-            raise Exception("Environment variable MAX_BLOCKS_PER_BATCH not set")
-
-        protocol = os.getenv("PROTOCOL")
-        if not protocol:
-            raise Exception("Environment variable PROTOCOL not set")
-
-        return cls(
-            l2_prefunded_priv_key=l2_prefunded_priv_key,
-            l2_prefunded_priv_key_2=l2_prefunded_priv_key_2,
-            taiko_inbox_address=taiko_inbox_address,
-            preconf_whitelist_address=preconf_whitelist_address,
-            forced_inclusion_store_address=forced_inclusion_store_address,
-            preconf_min_txs=preconf_min_txs,
-            preconf_heartbeat_ms=preconf_heartbeat_ms,
-            l2_private_key=l2_private_key,
-            max_blocks_per_batch=max_blocks_per_batch,
-            protocol=protocol,
-        )
+        values = {}
+        for env_name, field_name, parse in _ENV_VARS_SCHEMA:
+            raw_value = os.getenv(env_name)
+            value = parse(raw_value) if raw_value else None
+            if value is None:
+                raise Exception(f"Environment variable {env_name} not set")
+            values[field_name] = value
+        return cls(**values)
 
     def is_shasta(self):
-        return self.protocol == "shasta"
+        return self._is_shasta
 
     def is_pacaya(self):
-        return self.protocol == "pacaya"
+        return self._is_pacaya
 
 @pytest.fixture(scope="session")
 def env_vars():
     """Centralized environment variables fixture"""
-    return EnvVars.from_env()
+    env = EnvVars.from_env()
+    set_preconf_heartbeat_ms(env.preconf_heartbeat_ms)
+    return env
 
 @pytest.fixture(scope="session")
-def l1_client():
-    w3 = Web3(Web3.HTTPProvider(os.getenv("L1_RPC_URL")))
+def prefunded_account(env_vars):
+    """Account of the first prefunded key, derived once per session"""
+    return Account.from_key(env_vars.l2_prefunded_priv_key)
+
+@pytest.fixture(scope="session")
+def fi_account(env_vars):
+    """Forced inclusion sender account of l2_private_key, derived once per session"""
+    return Account.from_key(env_vars.l2_private_key)
+
+# Per-request timeout for the Web3 HTTP providers
+RPC_TIMEOUT_SEC = 30
+
+@pytest.fixture(scope="session")
+def http_session():
+    """Pooled keep-alive HTTP session shared by all Web3 providers, closed by utils at exit"""
+    return HTTP_SESSION
+
+@pytest.fixture(scope="session")
+def l1_client(http_session):
+    w3 = Web3(Web3.HTTPProvider(os.getenv("L1_RPC_URL"), session=http_session, request_kwargs={"timeout": RPC_TIMEOUT_SEC}))
+    set_ws_url(w3, os.getenv("L1_WS_URL"))
     return w3
 
 @pytest.fixture(scope="session")
-def l2_client_node1():
-    w3 = Web3(Web3.HTTPProvider(os.getenv("L2_RPC_URL_NODE1")))
+def l2_client_node1(http_session):
+    w3 = Web3(Web3.HTTPProvider(os.getenv("L2_RPC_URL_NODE1"), session=http_session, request_kwargs={"timeout": RPC_TIMEOUT_SEC}))
+    set_ws_url(w3, os.getenv("L2_WS_URL_NODE1"))
     return w3
 
 @pytest.fixture(scope="session")
-def l2_client_node2():
-    w3 = Web3(Web3.HTTPProvider(os.getenv("L2_RPC_URL_NODE2")))
+def l2_client_node2(http_session):
+    w3 = Web3(Web3.HTTPProvider(os.getenv("L2_RPC_URL_NODE2"), session=http_session, request_kwargs={"timeout": RPC_TIMEOUT_SEC}))
+    set_ws_url(w3, os.getenv("L2_WS_URL_NODE2"))
     return w3
 
+class PooledBeacon(Beacon):
+    """Beacon client that sends its GET requests through a shared keep-alive session"""
+
+    def __init__(self, base_url, session, request_timeout=10.0):
+        super().__init__(base_url, request_timeout=request_timeout)
+        self._session = session
+
+    def _make_get_request(self, endpoint_url, params=None):
+        response = self._session.get(self.base_url + endpoint_url, params=params, timeout=self.request_timeout)
+        response.raise_for_status()
+        return response.json()
+
 @pytest.fixture(scope="session")
-def beacon_client():
+def beacon_client(http_session):
     beacon_rpc_url = os.getenv("BEACON_RPC_URL")
     if not beacon_rpc_url:
         raise Exception("Environment variable BEACON_RPC_URL not set")
 
-    return Beacon(beacon_rpc_url)
+    return PooledBeacon(beacon_rpc_url, http_session)
 
 @pytest.fixture(scope="session")
 def forced_inclusion_parameters(l1_client, env_vars):
@@ -127,9 +142,13 @@ def forced_inclusion_parameters(l1_client, env_vars):
 def catalyst_node_teardown():
     """Fixture to ensure both catalyst nodes are running after test"""
     yield None
-    print("Test teardown: ensuring both catalyst nodes are running")
-    ensure_catalyst_node_running(1)
-    ensure_catalyst_node_running(2)
+    stopped_nodes = get_stopped_catalyst_nodes()
+    if not stopped_nodes:
+        print("Test teardown: no catalyst node was stopped")
+        return
+    print(f"Test teardown: ensuring stopped catalyst nodes {stopped_nodes} are running")
+    for node_number in stopped_nodes:
+        ensure_catalyst_node_running(node_number)
 
 @pytest.fixture
 def forced_inclusion_teardown(l1_client, l2_client_node1, env_vars):
@@ -147,30 +166,48 @@ def global_setup(l1_client, l2_client_node1, l2_client_node2, env_vars):
     print("Wait for Geth sync with TaikoInbox")
     block_number_contract = get_last_block_id(l1_client, env_vars)
 
+    delay = POLL_INITIAL_DELAY_SEC
+    last_status = None
     while True:
-        block_number_node1 = l2_client_node1.eth.block_number
-        block_number_node2 = l2_client_node2.eth.block_number
+        # The nodes are separate endpoints, so query them concurrently rather than in one batch
+        block_number_node1, block_number_node2 = run_parallel(
+            lambda: l2_client_node1.eth.block_number,
+            lambda: l2_client_node2.eth.block_number,
+        )
         if block_number_contract <= block_number_node1 and block_number_contract <= block_number_node2:
             break
 
-        print(
-            f"Block Number Contract: {block_number_contract}, "
-            f"Node1: {block_number_node1}, "
-            f"Node2: {block_number_node2}"
-        )
-        print("Sleeping 10 sec to sync...")
-        time.sleep(10)
+        status = (block_number_node1, block_number_node2)
+        if status != last_status:
+            print(
+                f"Block Number Contract: {block_number_contract}, "
+                f"Node1: {block_number_node1}, "
+                f"Node2: {block_number_node2}"
+            )
+            print("Waiting for nodes to sync...")
+            last_status = status
+        delay = sleep_with_backoff(delay)
 
     print("Wait for operator to be set in whitelist contract")
     empty_address = "0x0000000000000000000000000000000000000000"
+    ws_url = get_ws_url(l1_client)
+    delay = POLL_INITIAL_DELAY_SEC
+    waiting_reported = False
     while True:
         current_operator = get_current_operator(l1_client, env_vars.preconf_whitelist_address)
         if current_operator != empty_address:
             print(f"Operator is set: {current_operator}")
             break
 
-        print(f"Current operator is empty address, waiting...")
-        time.sleep(10)
+        if not waiting_reported:
+            print(f"Current operator is empty address, waiting...")
+            waiting_reported = True
+            if ws_url:
+                # Block on OperatorAdded instead of polling. The operator only becomes active
+                # from its activeSince epoch, so keep polling afterwards until it is returned.
+                wait_for_operator_added_event(l1_client, ws_url, env_vars.preconf_whitelist_address, OPERATOR_EVENT_TIMEOUT_SEC)
+                continue
+        delay = sleep_with_backoff(delay)
 
     yield
     print("Global teardown after all tests")
@@ -1,13 +1,13 @@
 from web3 import Web3
-import json
-from utils import get_shasta_inbox_abi
+from utils import cached_contract
 
-with open("../pacaya/src/l1/abi/ITaikoInbox.json") as f:
-    pacaya_abi = json.load(f)
+def get_inbox_contract(l1_client, env_vars):
+    abi_name = "ITaikoInbox" if env_vars.is_pacaya() else "ShastaInbox"
+    return cached_contract(l1_client, env_vars.taiko_inbox_address, abi_name)
 
 def get_last_batch_id(l1_client, env_vars):
     if env_vars.is_pacaya():
-        contract = l1_client.eth.contract(address=env_vars.taiko_inbox_address, abi=pacaya_abi)
+        contract = get_inbox_contract(l1_client, env_vars)
         result = contract.functions.getStats2().call()
         last_batch_id = result[0]
         return last_batch_id
@@ -18,8 +18,9 @@ def get_last_batch_id(l1_client, env_vars):
 
 def get_last_block_id(l1_client, env_vars):
     if env_vars.is_pacaya():
-        batch_id = int(get_last_batch_id(l1_client, env_vars)) - 1
-        contract = l1_client.eth.contract(address=env_vars.taiko_inbox_address, abi=pacaya_abi)
+        # getBatch needs the id returned by getStats2, so the two reads cannot share a batch
+        contract = get_inbox_contract(l1_client, env_vars)
+        batch_id = int(contract.functions.getStats2().call()[0]) - 1
         result = contract.functions.getBatch(batch_id).call()
         last_block_id = result[1]
         return last_block_id
@@ -30,7 +31,6 @@ def get_last_block_id(l1_client, env_vars):
         return last_block_id
 
 def get_core_state(l1_client, env_vars):
-    shasta_abi = get_shasta_inbox_abi()
-    contract = l1_client.eth.contract(address=env_vars.taiko_inbox_address, abi=shasta_abi)
+    contract = get_inbox_contract(l1_client, env_vars)
     result = contract.functions.getCoreState().call()
     return result
\ No newline at end of file
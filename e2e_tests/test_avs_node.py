@@ -1,18 +1,33 @@
-import pytest
-import requests
-from web3 import Web3
-import os
-import sys
-from utils import *
-import subprocess
-import re
+import time
+from utils import (
+    get_beacon_spec,
+    get_current_operator_number,
+    get_slot_in_epoch,
+    run_parallel,
+    send_n_txs_without_waiting,
+    send_transaction,
+    spam_n_blocks,
+    spam_n_txs,
+    spam_txs_until_new_batch_is_proposed,
+    start_catalyst_node,
+    stop_catalyst_node,
+    wait_for_batch_proposed_event,
+    wait_for_epoch_with_operator_switch_and_slot,
+    wait_for_handover_window,
+    wait_for_new_block,
+    wait_for_slot_beginning,
+    wait_for_tx_to_be_included,
+)
 
 
 def test_rpcs(l1_client, l2_client_node1, l2_client_node2, beacon_client, env_vars):
     """Test to verify the chain IDs of L1 and L2 networks"""
-    l1_chain_id = l1_client.eth.chain_id
-    l2_chain_id_node1 = l2_client_node1.eth.chain_id
-    l2_chain_id_node2 = l2_client_node2.eth.chain_id
+    l1_chain_id, l2_chain_id_node1, l2_chain_id_node2, spec = run_parallel(
+        lambda: l1_client.eth.chain_id,
+        lambda: l2_client_node1.eth.chain_id,
+        lambda: l2_client_node2.eth.chain_id,
+        lambda: get_beacon_spec(beacon_client),
+    )
 
     print(f"L1 Chain ID: {l1_chain_id}")
     print(f"L2 Chain ID Node 1: {l2_chain_id_node1}")
@@ -24,24 +39,23 @@ def test_rpcs(l1_client, l2_client_node1, l2_client_node2, beacon_client, env_va
     assert l1_chain_id != l2_chain_id_node1, "L1 and L2 should have different chain IDs"
     assert l2_chain_id_node1 == l2_chain_id_node2, "L2 nodes should have the same chain IDs"
 
-    spec = beacon_client.get_spec()
-    slots_per_epoch = int(spec['data']['SLOTS_PER_EPOCH'])
-    slot_duration = int(spec['data']['SECONDS_PER_SLOT'])
+    slots_per_epoch = spec.slots_per_epoch
+    slot_duration = spec.seconds_per_slot
     print(f"Slot Duration: {slot_duration}")
     print(f"Slots Per Epoch: {slots_per_epoch}")
     assert slot_duration > 0, "Slot duration should be greater than 0"
     assert slots_per_epoch > 0, "Slots per epoch should be greater than 0"
 
-def test_preconfirm_transaction(l1_client, l2_client_node1, env_vars):
-    account = l2_client_node1.eth.account.from_key(env_vars.l2_prefunded_priv_key)
+def test_preconfirm_transaction(l1_client, l2_client_node1, env_vars, prefunded_account):
+    account = prefunded_account
     nonce = l2_client_node1.eth.get_transaction_count(account.address)
     l2_block_number = l2_client_node1.eth.block_number
 
     tx_hash = send_transaction(nonce, account, '0.00005', l2_client_node1, env_vars.l2_prefunded_priv_key)
     assert wait_for_tx_to_be_included(l2_client_node1, tx_hash), "Transaction should be included in L2 Node 1"
 
-def test_p2p_preconfirmation(l2_client_node1, l2_client_node2, env_vars):
-    account = l2_client_node1.eth.account.from_key(env_vars.l2_prefunded_priv_key)
+def test_p2p_preconfirmation(l2_client_node1, l2_client_node2, env_vars, prefunded_account):
+    account = prefunded_account
     nonce = l2_client_node1.eth.get_transaction_count(account.address)
     l2_node_2_block_number = l2_client_node2.eth.block_number
 
@@ -49,21 +63,24 @@ def test_p2p_preconfirmation(l2_client_node1, l2_client_node2, env_vars):
 
     assert wait_for_new_block(l2_client_node2, l2_node_2_block_number), "L2 Node 2 should have a new block after sending a transaction"
 
-    l2_node_2_block_number_after = l2_client_node2.eth.block_number
+    node_2_block = l2_client_node2.eth.get_block('latest')
+    l2_node_2_block_number_after = node_2_block.number
     node_1_block_hash = l2_client_node1.eth.get_block(l2_node_2_block_number_after).hash
-    node_2_block_hash = l2_client_node2.eth.get_block(l2_node_2_block_number_after).hash
+    node_2_block_hash = node_2_block.hash
 
     print(f"L2 Node 2 Block Number: {l2_node_2_block_number}")
     print(f"L2 Node 2 Block Number After: {l2_node_2_block_number_after}")
 
     assert node_2_block_hash == node_1_block_hash, "L2 Node 1 and L2 Node 2 should have the same block hash after sending a transaction"
 
-def test_handover_transaction(l2_client_node1, l2_client_node2, beacon_client, env_vars):
+def test_handover_transaction(l2_client_node1, l2_client_node2, beacon_client, env_vars, prefunded_account):
     wait_for_handover_window(beacon_client)
 
-    account = l2_client_node1.eth.account.from_key(env_vars.l2_prefunded_priv_key)
-    nonce = l2_client_node1.eth.get_transaction_count(account.address)
-    l2_node_2_block_number = l2_client_node2.eth.block_number
+    account = prefunded_account
+    nonce, l2_node_2_block_number = run_parallel(
+        lambda: l2_client_node1.eth.get_transaction_count(account.address),
+        lambda: l2_client_node2.eth.block_number,
+    )
     print(f"L2 Node 2 Block Number: {l2_node_2_block_number}")
 
     tx_hash = send_transaction(nonce, account, '0.00007', l2_client_node1, env_vars.l2_prefunded_priv_key)
@@ -72,8 +89,9 @@ def test_handover_transaction(l2_client_node1, l2_client_node2, beacon_client, e
     assert wait_for_tx_to_be_included(l2_client_node2, tx_hash), "Transaction should be included in L2 Node 2"
 
 def test_propose_batch_to_l1_after_reaching_max_blocks_per_batch(l2_client_node1, l1_client, env_vars):
-    current_block = l1_client.eth.block_number
-    current_block_timestamp = l1_client.eth.get_block(current_block).timestamp
+    latest_block = l1_client.eth.get_block('latest')
+    current_block = latest_block.number
+    current_block_timestamp = latest_block.timestamp
     spam_n_txs(l2_client_node1, env_vars.l2_prefunded_priv_key, 11)
 
     event = wait_for_batch_proposed_event(l1_client, current_block, env_vars)
@@ -111,7 +129,7 @@ def test_proposing_other_operator_blocks(l2_client_node1, l1_client, beacon_clie
     stop_catalyst_node(node_number)
 
     wait_for_slot_beginning(beacon_client, 0)
-    wait_for_batch_proposed_event(l1_client, l1_client.eth.block_number, env_vars)
+    wait_for_batch_proposed_event(l1_client, 'latest', env_vars)
 
     # sent tx should still be included, no reorg
     wait_for_tx_to_be_included(l2_client_node1, tx_hash)
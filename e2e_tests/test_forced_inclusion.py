@@ -1,24 +1,65 @@
-from unittest import skip
+import pytest
 from web3 import Web3
 from utils import *
 import subprocess
 import re
 import time
-from eth_account import Account
+import json
 from chain_info import ChainInfo
 from taiko_inbox import get_last_block_id
 
 
-def send_forced_inclusion(nonce_delta, env_vars):
+def is_block_proposed(l1_client, env_vars, block_number):
+    return get_last_block_id(l1_client, env_vars) >= block_number
+
+# Transaction hash printed by the toolbox send command
+_TX_HASH_RE = re.compile(r"hash=(0x[a-fA-F0-9]{64})")
+
+def forced_inclusion_toolbox_image(env_vars):
     if env_vars.is_pacaya():
-        image = "nethswitchboard/taiko-forced-inclusion-toolbox"
-    else:
-        image = "nethswitchboard/taiko-forced-inclusion-toolbox:shasta"
-    cmd = [
-        "docker", "run", "--network", "host", "--env-file", ".env", "--rm",
-        image, "send",
-        "--nonce-delta", str(nonce_delta)
-    ]
+        return "nethswitchboard/taiko-forced-inclusion-toolbox"
+    return "nethswitchboard/taiko-forced-inclusion-toolbox:shasta"
+
+def start_forced_inclusion_toolbox(image):
+    """
+    Start a detached toolbox container that idles so sends can be docker exec'd into it.
+    Returns (container id, image entrypoint), or None if the container could not be started.
+    """
+    container = None
+    try:
+        # docker run pulls the image if needed, so inspect it afterwards
+        run = subprocess.run(
+            ["docker", "run", "-d", "--rm", "--network", "host", "--env-file", ".env",
+             "--entrypoint", "sleep", image, "infinity"],
+            capture_output=True, text=True, check=True,
+        )
+        container = run.stdout.strip()
+        inspect = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{json .Config.Entrypoint}}", image],
+            capture_output=True, text=True, check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Could not start forced inclusion toolbox container, falling back to docker run per send: {e.stderr}")
+        if container:
+            subprocess.run(["docker", "rm", "-f", container], capture_output=True, text=True)
+        return None
+    print(f"Started forced inclusion toolbox container {container}")
+    return container, json.loads(inspect.stdout) or []
+
+@pytest.fixture(scope="module")
+def forced_inclusion_toolbox(env_vars):
+    """Command prefix for toolbox subcommands, run in one long-lived container for the module"""
+    image = forced_inclusion_toolbox_image(env_vars)
+    started = start_forced_inclusion_toolbox(image)
+    if started is None:
+        yield ["docker", "run", "--network", "host", "--env-file", ".env", "--rm", image]
+        return
+    container, entrypoint = started
+    yield ["docker", "exec", container, *entrypoint]
+    subprocess.run(["docker", "rm", "-f", container], capture_output=True, text=True)
+
+def send_forced_inclusion(nonce_delta, toolbox_cmd):
+    cmd = [*toolbox_cmd, "send", "--nonce-delta", str(nonce_delta)]
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
     except subprocess.CalledProcessError as e:
@@ -34,26 +75,23 @@ def send_forced_inclusion(nonce_delta, env_vars):
         print("Forced inclusion toolbox error output:")
         print(result.stderr)
 
-    regex = r"hash=(0x[a-fA-F0-9]{64})"
-    match = re.search(regex, result.stdout)
+    match = _TX_HASH_RE.search(result.stdout)
     assert match, "Could not find tx hash in forced inclusion toolbox output"
     forced_inclusion_tx_hash = match.group(1)
     print(f"Extracted forced inclusion tx hash: {forced_inclusion_tx_hash}")
     return forced_inclusion_tx_hash
 
-def test_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown):
+def test_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_toolbox, fi_account):
     """
     This test runs the forced inclusion toolbox docker command and prints its output.
     """
     forced_inclusion_teardown
 
     check_empty_forced_inclusion_store(l1_client, env_vars)
-    fi_account = Account.from_key(env_vars.l2_private_key)
     ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
-    get_last_block_id(l1_client, env_vars)
 
     #send forced inclusion
-    forced_inclusion_tx_hash = send_forced_inclusion(0, env_vars)
+    forced_inclusion_tx_hash = send_forced_inclusion(0, forced_inclusion_toolbox)
     print(f"Extracted forced inclusion tx hash: {forced_inclusion_tx_hash}")
 
     delay = get_two_l2_slots_duration_sec(env_vars.preconf_heartbeat_ms)
@@ -61,14 +99,12 @@ def test_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, f
     # Synchronize transaction sending with L1 slot time
     wait_for_next_slot(beacon_client)
     spam_n_txs_wait_only_for_the_last(l2_client_node1, env_vars.l2_prefunded_priv_key, 41, delay)
-    wait_for_batch_proposed_event(l1_client, l1_client.eth.block_number, env_vars)
-
-    get_last_block_id(l1_client, env_vars)
+    wait_for_batch_proposed_event(l1_client, 'latest', env_vars)
 
     assert wait_for_tx_to_be_included(l2_client_node1, forced_inclusion_tx_hash), "Forced inclusion tx should be included in L2 Node 1"
 
 
-def test_three_consecutive_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_parameters):
+def test_three_consecutive_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_toolbox, forced_inclusion_parameters):
     """
     Send three consecutive forced inclusions. And include them in the chain
     """
@@ -78,31 +114,26 @@ def test_three_consecutive_forced_inclusion(l1_client, beacon_client, l2_client_
     delay = get_two_l2_slots_duration_sec(env_vars.preconf_heartbeat_ms)
 
     # Restart nodes for clean start
-    restart_catalyst_node(1)
-    restart_catalyst_node(2)
-    time.sleep(3*slot_duration_sec)
+    restart_catalyst_nodes(1, 2)
+    wait_for_catalyst_nodes_warmup((1, 2), 3 * slot_duration_sec)
 
     check_empty_forced_inclusion_store(l1_client, env_vars)
 
-    # send 3 forced inclusion
-    tx_1 = send_forced_inclusion(0, env_vars)
-    tx_2 = send_forced_inclusion(1, env_vars)
-    tx_3 = send_forced_inclusion(2, env_vars)
+    # send 3 forced inclusion one after another, they share the L1 sender and the queue is consumed in order
+    tx_1 = send_forced_inclusion(0, forced_inclusion_toolbox)
+    tx_2 = send_forced_inclusion(1, forced_inclusion_toolbox)
+    tx_3 = send_forced_inclusion(2, forced_inclusion_toolbox)
     # Synchronize transaction sending with slot time
     wait_for_next_slot(beacon_client)
     # spam transactions
     spam_n_txs_wait_only_for_the_last(l2_client_node1, env_vars.l2_prefunded_priv_key, 4 * env_vars.max_blocks_per_batch, delay)
 
-    # wait 2 l1 slots to include all propose batch transactions
-    time.sleep(slot_duration_sec * 2)
-
-    wait_for_tx_to_be_included(l2_client_node1, tx_1)
-    wait_for_tx_to_be_included(l2_client_node1, tx_2)
-    wait_for_tx_to_be_included(l2_client_node1, tx_3)
+    # wait up to 2 l1 slots to include all propose batch transactions
+    wait_for_txs_included(l2_client_node1, (tx_1, tx_2, tx_3), slot_duration_sec * 2 + 10)
     wait_for_forced_inclusion_store_to_be_empty(l1_client, env_vars)
 
-@skip("Skipping end of sequencing forced inclusion test, cannot run with empty blocks production")
-def test_end_of_sequencing_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_parameters):
+@pytest.mark.skip(reason="Skipping end of sequencing forced inclusion test, cannot run with empty blocks production")
+def test_end_of_sequencing_forced_inclusion(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_toolbox, forced_inclusion_parameters, fi_account):
     """
     Send forced inclusions before end of sequencing and include it int the chain after handover window
     """
@@ -110,13 +141,12 @@ def test_end_of_sequencing_forced_inclusion(l1_client, beacon_client, l2_client_
 
     slot_duration_sec = get_slot_duration_sec(beacon_client)
     delay = get_two_l2_slots_duration_sec(env_vars.preconf_heartbeat_ms)
-    fi_account = Account.from_key(env_vars.l2_private_key)
     wait_for_epoch_with_operator_switch_and_slot(beacon_client, l1_client, env_vars.preconf_whitelist_address, 19)
 
     # get chain info
     chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
     # send 1 forced inclusion
-    forced_inclusion_tx_hash = send_forced_inclusion(0, env_vars)
+    forced_inclusion_tx_hash = send_forced_inclusion(0, forced_inclusion_toolbox)
     # wait for handower window
     wait_for_slot_beginning(beacon_client, 25)
 
@@ -148,7 +178,7 @@ def test_end_of_sequencing_forced_inclusion(l1_client, beacon_client, l2_client_
     wait_for_tx_to_be_included(l2_client_node1, forced_inclusion_tx_hash)
     wait_for_forced_inclusion_store_to_be_empty(l1_client, env_vars)
 
-def test_preconf_forced_inclusion_after_restart(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_parameters):
+def test_preconf_forced_inclusion_after_restart(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_toolbox, forced_inclusion_parameters, fi_account):
     """
     Restart the nodes, then add FI and produce transactions every 2 L2 slots to build batch.
     """
@@ -158,22 +188,20 @@ def test_preconf_forced_inclusion_after_restart(l1_client, beacon_client, l2_cli
 
     slot_duration_sec = get_slot_duration_sec(beacon_client)
     delay = get_two_l2_slots_duration_sec(env_vars.preconf_heartbeat_ms)
-    fi_account = Account.from_key(env_vars.l2_private_key)
 
     wait_for_slot_beginning(beacon_client, 1)
 
     # Restart nodes
-    restart_catalyst_node(1)
-    restart_catalyst_node(2)
+    restart_catalyst_nodes(1, 2)
 
     # Wait for nodes to warm up
-    time.sleep(slot_duration_sec * 3)
+    wait_for_catalyst_nodes_warmup((1, 2), slot_duration_sec * 3)
 
     # Validate chain info
     chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
 
     # Send forced inclusion
-    forced_inclusion_tx_hash = send_forced_inclusion(0, env_vars)
+    forced_inclusion_tx_hash = send_forced_inclusion(0, forced_inclusion_toolbox)
 
     # Synchronize transaction sending with L1 slot time
     wait_for_next_slot(beacon_client)
@@ -189,21 +217,25 @@ def test_preconf_forced_inclusion_after_restart(l1_client, beacon_client, l2_cli
     # Get chain info
     before_l1_inclusion_chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
 
-    # Wait for transactions to be included on L1
-    time.sleep(slot_duration_sec * 3)
+    # Wait up to 3 L1 slots for the blocks to be proposed to L1
+    assert wait_until(lambda: is_block_proposed(l1_client, env_vars, before_l1_inclusion_chain_info.block_number), slot_duration_sec * 3), \
+        f"L2 block {before_l1_inclusion_chain_info.block_number} was not proposed to L1 within 3 slots"
+    # Let one more L1 block land on top of the proposal so the driver has synced it into L2 before checking for a reorg
+    proposal_seen_at_l1_block = l1_client.eth.block_number
+    assert wait_until(lambda: l1_client.eth.block_number > proposal_seen_at_l1_block, slot_duration_sec * 2), \
+        "No new L1 block after the proposal"
 
     # Verify reorg after L1 inclusion
     before_l1_inclusion_chain_info.check_reorg(l2_client_node1)
     wait_for_tx_to_be_included(l2_client_node1, forced_inclusion_tx_hash)
     wait_for_forced_inclusion_store_to_be_empty(l1_client, env_vars)
 
-def test_recover_forced_inclusion_after_restart(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_parameters):
+def test_recover_forced_inclusion_after_restart(l1_client, beacon_client, l2_client_node1, env_vars, forced_inclusion_teardown, forced_inclusion_toolbox, forced_inclusion_parameters, fi_account):
     """
     Test forced inclusion recovery after node restart
     """
     forced_inclusion_teardown
 
-    fi_account = Account.from_key(env_vars.l2_private_key)
     slot_duration_sec = get_slot_duration_sec(beacon_client)
 
     # wait_for_slot_beginning(beacon_client, 1)
@@ -211,28 +243,26 @@ def test_recover_forced_inclusion_after_restart(l1_client, beacon_client, l2_cli
     start_chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
     # start_block = l1_client.eth.block_number
 
-    forced_inclusion_tx_hash = send_forced_inclusion(0, env_vars)
+    forced_inclusion_tx_hash = send_forced_inclusion(0, forced_inclusion_toolbox)
 
     wait_for_new_block(l2_client_node1, start_chain_info.block_number)
 
     # Restart nodes
-    restart_catalyst_node(1)
-    restart_catalyst_node(2)
+    restart_catalyst_nodes(1, 2)
 
     wait_for_forced_inclusion_store_to_be_empty(l1_client, env_vars)
     chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
     assert start_chain_info.fi_sender_nonce + 1 == chain_info.fi_sender_nonce, "FI transaction not included after restart"
     start_chain_info.check_reorg(l2_client_node1)
 
-@skip("Skipping test_verify_forced_inclusion_after_previous_operator_stop, needs refactor with empty blocks production")
-def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_client, l2_client_node1, env_vars, catalyst_node_teardown, forced_inclusion_teardown, forced_inclusion_parameters):
+@pytest.mark.skip(reason="Skipping test_verify_forced_inclusion_after_previous_operator_stop, needs refactor with empty blocks production")
+def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_client, l2_client_node1, env_vars, catalyst_node_teardown, forced_inclusion_teardown, forced_inclusion_toolbox, forced_inclusion_parameters, fi_account):
     """
     Test forced inclusion after previous operator stop
     """
     # Start all nodes after test
     catalyst_node_teardown
     forced_inclusion_teardown
-    fi_account = Account.from_key(env_vars.l2_private_key)
 
     slot_duration_sec = get_slot_duration_sec(beacon_client)
     delay = get_two_l2_slots_duration_sec(env_vars.preconf_heartbeat_ms)
@@ -241,11 +271,11 @@ def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_
     wait_for_epoch_with_operator_switch_and_slot(beacon_client, l1_client, env_vars.preconf_whitelist_address, 1)
     node_number = get_current_operator_number(l1_client, env_vars.l2_prefunded_priv_key, env_vars.preconf_whitelist_address)
 
-    op1_chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
+    op1_chain_info = ChainInfo.snapshot_nonce_only(fi_account.address, l2_client_node1)
 
     # Send 2 forced inclusions
-    send_forced_inclusion(0, env_vars)
-    send_forced_inclusion(1)
+    send_forced_inclusion(0, forced_inclusion_toolbox)
+    send_forced_inclusion(1, forced_inclusion_toolbox)
 
     # Synchronize transaction sending with L1 slot time
     wait_for_next_slot(beacon_client)
@@ -272,7 +302,7 @@ def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_
 
     # send transactions to create batch
     spam_n_txs_wait_only_for_the_last(l2_client_node1, env_vars.l2_prefunded_priv_key, env_vars.max_blocks_per_batch, delay)
-    after_spam_chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
+    after_spam_chain_info = ChainInfo.snapshot_block_only(l2_client_node1)
 
     # wait for new epoch
     wait_for_slot_beginning(beacon_client, 0)
@@ -291,7 +321,7 @@ def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_
     op1_stop_chain_info.check_reorg(l2_client_node1)
     after_spam_chain_info.check_reorg(l2_client_node1)
     new_epoch_chain_info.check_reorg(l2_client_node1)
-    after_inclusion_chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
+    after_inclusion_chain_info = ChainInfo.snapshot_nonce_only(fi_account.address, l2_client_node1)
     assert new_epoch_chain_info.fi_sender_nonce == after_inclusion_chain_info.fi_sender_nonce, "FI transaction not included"
 
     # Synchronize transaction sending with L1 slot time
@@ -306,5 +336,5 @@ def test_verify_forced_inclusion_after_previous_operator_stop(l1_client, beacon_
 
     # Validate chain info
     after_spam_chain_info.check_reorg(l2_client_node1)
-    chain_info = ChainInfo.from_chain(fi_account.address, l2_client_node1, l1_client, env_vars, beacon_client)
+    chain_info = ChainInfo.snapshot_nonce_only(fi_account.address, l2_client_node1)
     assert after_spam_chain_info.fi_sender_nonce == chain_info.fi_sender_nonce, "FI transaction not included"
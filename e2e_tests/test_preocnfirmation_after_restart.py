@@ -7,7 +7,6 @@ import sys
 from utils import *
 import subprocess
 import re
-import time
 from eth_account import Account
 from taiko_inbox import get_last_batch_id
 
@@ -20,10 +19,9 @@ def test_preocnfirmation_after_restart(l1_client, beacon_client, l2_client_node1
     print("Slot: ", slot)
     try:
         #restart nodes
-        restart_catalyst_node(1)
-        restart_catalyst_node(2)
+        restart_catalyst_nodes(1, 2)
         # wait for nodes warmup
-        time.sleep(slot_duration_sec * 3)
+        wait_for_catalyst_nodes_warmup((1, 2), slot_duration_sec * 3)
         # get chain info
         block_number = l2_client_node1.eth.block_number
         print("Block number:", block_number)
@@ -34,7 +32,7 @@ def test_preocnfirmation_after_restart(l1_client, beacon_client, l2_client_node1
         print("delay", delay)
         spam_n_txs_wait_only_for_the_last(l2_client_node1, env_vars.l2_prefunded_priv_key, 3 * env_vars.max_blocks_per_batch, delay)
         # wait for transactions to be included on L1
-        wait_for_batch_proposed_event(l1_client, l1_client.eth.block_number, env_vars)
+        wait_for_batch_proposed_event(l1_client, 'latest', env_vars)
         # verify
         slot = get_slot_in_epoch(beacon_client)
         print("Slot: ", slot)
@@ -1,61 +1,306 @@
+import atexit
 import time
+import asyncio
 import web3
+from web3 import AsyncWeb3, WebSocketProvider
 import subprocess
 import json
 import os
+import sys
 import requests
-import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import functools
+import tomllib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+from hexbytes import HexBytes
 from forced_inclusion_store import pacaya_fi_abi
 
-def send_transaction(nonce : int, account, amount, eth_client, private_key):
-    base_fee = eth_client.eth.get_block('latest')['baseFeePerGas']
+try:
+    import docker as docker_sdk
+except ImportError:
+    # Without the SDK the catalyst node helpers shell out to the docker CLI
+    docker_sdk = None
+
+def _make_http_session():
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Pooled keep-alive HTTP session shared by the Web3 providers, the beacon client and ABI downloads.
+# Owned by this module and closed when the interpreter exits
+HTTP_SESSION = _make_http_session()
+atexit.register(HTTP_SESSION.close)
+
+_PARALLEL_THREAD_NAME_PREFIX = "e2e-parallel"
+_parallel_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix=_PARALLEL_THREAD_NAME_PREFIX)
+
+def run_parallel(*calls):
+    """Run independent blocking calls concurrently and return their results in call order"""
+    if threading.current_thread().name.startswith(_PARALLEL_THREAD_NAME_PREFIX):
+        # Nested call from a worker, run inline so the pool cannot deadlock on itself
+        return [call() for call in calls]
+    futures = [submit_background(call) for call in calls]
+    return [future.result() for future in futures]
+
+def submit_background(call):
+    """Start a blocking call on the shared pool and return its future, inline when already on a worker"""
+    if threading.current_thread().name.startswith(_PARALLEL_THREAD_NAME_PREFIX):
+        future = Future()
+        try:
+            future.set_result(call())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _parallel_executor.submit(call)
+
+_ws_urls = {}
+
+def set_ws_url(eth_client, ws_url):
+    """Register an optional WebSocket endpoint used for push-based waits on eth_client"""
+    if ws_url:
+        _ws_urls[eth_client] = ws_url
+
+def get_ws_url(eth_client):
+    return _ws_urls.get(eth_client)
+
+def watch_subscription(ws_url, subscription_type, subscription_arg, handle, timeout):
+    """
+    Subscribe over WebSocket and pass every notification result to handle until it returns
+    something other than None. handle(None) is called once right after subscribing to pick up
+    anything that happened before the subscription was active. Returns None on timeout.
+    """
+    async def watch():
+        async with AsyncWeb3(WebSocketProvider(ws_url)) as w3:
+            await w3.eth.subscribe(subscription_type, subscription_arg)
+            result = handle(None)
+            if result is not None:
+                return result
+            async for message in w3.socket.process_subscriptions():
+                result = handle(message["result"])
+                if result is not None:
+                    return result
+
+    try:
+        return asyncio.run(asyncio.wait_for(watch(), timeout))
+    except asyncio.TimeoutError:
+        return None
+
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+
+POLL_INITIAL_DELAY_SEC = 0.25
+POLL_MAX_DELAY_SEC = 2.0
+POLL_BACKOFF_FACTOR = 1.5
+
+# Upper bound for push-based waits before falling back to polling
+OPERATOR_EVENT_TIMEOUT_SEC = 120
+
+# web3's own wait_for_transaction_receipt default
+RECEIPT_POLL_LATENCY_SEC = 0.1
+
+# Optional fixed poll interval for L2 waits, overrides the heartbeat-derived one
+POLL_LATENCY_SEC = float(os.getenv("POLL_LATENCY_SEC") or 0) or None
+
+# L2 block heartbeat from EnvVars, registered by the env_vars fixture
+_preconf_heartbeat_ms = None
+
+def set_preconf_heartbeat_ms(preconf_heartbeat_ms):
+    """Register the validated L2 block heartbeat that get_poll_latency_sec derives its interval from"""
+    global _preconf_heartbeat_ms
+    _preconf_heartbeat_ms = preconf_heartbeat_ms
+
+def get_poll_latency_sec(default=None):
+    """
+    Poll interval for L2 waits. POLL_LATENCY_SEC overrides it, otherwise default is used if given,
+    else a quarter of the registered L2 block heartbeat capped at one second.
+    """
+    if POLL_LATENCY_SEC is not None:
+        return POLL_LATENCY_SEC
+    if default is not None:
+        return default
+    return min(1.0, _preconf_heartbeat_ms / 4000) if _preconf_heartbeat_ms else 1.0
+
+def sleep_with_backoff(delay, max_delay=POLL_MAX_DELAY_SEC):
+    """Sleep for delay seconds and return the next, exponentially increased, delay"""
+    time.sleep(delay)
+    return min(delay * POLL_BACKOFF_FACTOR, max_delay)
+
+def wait_until(predicate, timeout, interval=1.0):
+    """
+    Poll predicate until it is truthy. Polls start POLL_INITIAL_DELAY_SEC apart and back off up to
+    interval seconds, so fast conditions are seen quickly without hammering slow ones.
+    Returns False if timeout expires first.
+    """
+    deadline = time.monotonic() + timeout
+    delay = min(POLL_INITIAL_DELAY_SEC, interval)
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        delay = sleep_with_backoff(min(delay, remaining), interval)
+
+# Per-transaction send logging, LOG_SENDS=0 skips the formatting entirely for bulk sends
+LOG_SENDS = os.getenv("LOG_SENDS", "1") != "0"
+
+def utc_time_with_micros():
+    """Current UTC time as HH:MM:SS.ffffffZ from a single clock read"""
+    now = time.time()
+    return time.strftime("%H:%M:%S", time.gmtime(now)) + f".{int(now * 1e6) % 1000000:06d}Z"
+
+def make_raw_batch_request(eth_client, requests):
+    """
+    Send (method, params) pairs as one JSON-RPC batch and return the raw responses in request order.
+    A node that rejects the whole batch answers with a single error object, which is raised here.
+    """
+    responses = eth_client.provider.make_batch_request(requests)
+    if not isinstance(responses, list):
+        raise RuntimeError(f"JSON-RPC batch rejected: {responses.get('error', responses)}")
+    return responses
+
+def get_tx_fee_params(eth_client):
+    """Fee and chain id fields for a transaction, read once and shared by a batch of sends"""
+    # One JSON-RPC batch for the base fee, priority fee and chain id instead of three round-trips
+    responses = make_raw_batch_request(eth_client, [
+        ("eth_getBlockByNumber", ["latest", False]),
+        ("eth_maxPriorityFeePerGas", []),
+        ("eth_chainId", []),
+    ])
+    errors = [response["error"] for response in responses if "error" in response]
+    if errors:
+        raise RuntimeError(f"Failed to read fee params: {errors}")
+    block, priority_fee, chain_id = (response["result"] for response in responses)
+    base_fee = int(block['baseFeePerGas'], 16)
     if base_fee < 25000000:
         base_fee = 25000000
-    priority_fee = eth_client.eth.max_priority_fee
-    max_fee_per_gas = base_fee * 2 + priority_fee
-    tx = {
-        'nonce': nonce,
+    priority_fee = int(priority_fee, 16)
+    return {
+        'maxFeePerGas': base_fee * 2 + priority_fee,
+        'maxPriorityFeePerGas': priority_fee,
+        'chainId': int(chain_id, 16),
+    }
+
+def build_tx_template(amount, fee_params):
+    """Every field of a spam transaction except the nonce, built once per batch of sends"""
+    return {
         'to': '0x0000000000000000000000000000000000000001',
-        'value': eth_client.to_wei(amount, 'ether'),
+        'value': web3.Web3.to_wei(amount, 'ether'),
         'gas': 40000,
-        'maxFeePerGas': max_fee_per_gas,
-        'maxPriorityFeePerGas': priority_fee,
-        'chainId': eth_client.eth.chain_id,
-        'type': 2  # EIP-1559 transaction type
+        'type': 2,  # EIP-1559 transaction type
+        **fee_params,
     }
 
-    # Get current UTC time with microseconds
-    now = time.gmtime()
-    current_time = time.strftime("%H:%M:%S", now) + f".{int(time.time()*1e6)%1000000:06d}Z"
+def sign_from_template(account, nonce : int, tx_template) -> bytes:
+    return account.sign_transaction({**tx_template, 'nonce': nonce}).raw_transaction
 
-    print(f'RPC URL: {eth_client.provider.endpoint_uri}, Sending from: {account.address}, nonce: {nonce}, time: {current_time}')
-    signed_tx = eth_client.eth.account.sign_transaction(tx, private_key)
-    tx_hash = eth_client.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print(f'Transaction sent: {tx_hash.hex()}')
+def send_transaction(nonce : int, account, amount, eth_client, private_key, tx_template=None):
+    """Sign and send one transaction, tx_template skips the fee lookup when the caller already has one"""
+    if tx_template is None:
+        tx_template = build_tx_template(amount, get_tx_fee_params(eth_client))
+    raw_tx = sign_from_template(account, nonce, tx_template)
+
+    if LOG_SENDS:
+        print(f'RPC URL: {eth_client.provider.endpoint_uri}, Sending from: {account.address}, nonce: {nonce}, time: {utc_time_with_micros()}')
+    tx_hash = eth_client.eth.send_raw_transaction(raw_tx)
+    if LOG_SENDS:
+        print(f'Transaction sent: {tx_hash.hex()}')
     return tx_hash
 
+def send_n_signed_transactions(eth_client, account, first_nonce, n, amount):
+    """Sign n transactions with consecutive nonces up front, then submit them concurrently"""
+    tx_template = build_tx_template(amount, get_tx_fee_params(eth_client))
+    raw_txs = [sign_from_template(account, first_nonce + i, tx_template) for i in range(n)]
+    if LOG_SENDS:
+        print(f'RPC URL: {eth_client.provider.endpoint_uri}, Sending {n} txs from: {account.address}, nonces: {first_nonce}..{first_nonce + n - 1}, time: {utc_time_with_micros()}')
+    tx_hashes = run_parallel(*(functools.partial(eth_client.eth.send_raw_transaction, raw_tx) for raw_tx in raw_txs))
+    if LOG_SENDS:
+        for tx_hash in tx_hashes:
+            print(f'Transaction sent: {tx_hash.hex()}')
+    return tx_hashes
+
+# QUIET=1 drops the wait_for_secs countdown and sleeps in one go
+QUIET = os.getenv("QUIET", "0") != "0"
+_COUNTDOWN_TEMPLATE = 'Waiting for {} seconds   \r'
+
 def wait_for_secs(seconds):
-    for i in range(seconds, 0, -1):
-        if (seconds - i) % 100 == 0:
-            print(f'Waiting for {i} seconds', end='\r')
-        time.sleep(1)
-    print('')
+    # The countdown redraws in place, which only makes sense on a terminal
+    if QUIET or not sys.stdout.isatty():
+        time.sleep(max(0, seconds))
+        return
+    stride = max(1, seconds // 20)
+    remaining = seconds
+    while remaining > 0:
+        sys.stdout.write(_COUNTDOWN_TEMPLATE.format(remaining))
+        sys.stdout.flush()
+        step = min(stride, remaining)
+        time.sleep(step)
+        remaining -= step
+    sys.stdout.write('\n')
+
+class BeaconSpec(NamedTuple):
+    seconds_per_slot: int
+    slots_per_epoch: int
+
+@functools.lru_cache(maxsize=None)
+def get_beacon_spec(beacon_client):
+    """Network constants from the beacon spec, fetched once per client"""
+    spec = beacon_client.get_spec()['data']
+    return BeaconSpec(
+        seconds_per_slot=int(spec['SECONDS_PER_SLOT']),
+        slots_per_epoch=int(spec['SLOTS_PER_EPOCH']),
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_genesis_time(beacon_client):
+    """Beacon chain genesis timestamp, fetched once per client"""
+    return int(beacon_client.get_genesis()['data']['genesis_time'])
+
+# The clock-derived slot is checked against the beacon head slot once every this many calls
+SLOT_DRIFT_CHECK_EVERY = int(os.getenv("SLOT_DRIFT_CHECK_EVERY", "32"))
+_slot_clock_calls = {}
+
+def get_current_slot(beacon_client):
+    """Current slot from genesis time and the local clock, cross-checked against the beacon head slot every few calls"""
+    clock_slot = (int(time.time()) - get_genesis_time(beacon_client)) // get_beacon_spec(beacon_client).seconds_per_slot
+    calls = _slot_clock_calls.get(beacon_client, 0)
+    _slot_clock_calls[beacon_client] = calls + 1
+    if calls % SLOT_DRIFT_CHECK_EVERY == 0:
+        head_slot = int(beacon_client.get_syncing()['data']['head_slot'])
+        if abs(head_slot - clock_slot) > 1:
+            # Clock and beacon disagree, trust the beacon and check again on the next call
+            print(f"Slot drift: clock slot {clock_slot}, beacon head slot {head_slot}")
+            _slot_clock_calls[beacon_client] = 0
+            return head_slot
+    return clock_slot
 
 def get_slot_in_epoch(beacon_client):
-    slots_per_epoch = int(beacon_client.get_spec()['data']['SLOTS_PER_EPOCH'])
-    current_slot = int(beacon_client.get_syncing()['data']['head_slot'])
-    return current_slot % slots_per_epoch
+    return get_current_slot(beacon_client) % get_beacon_spec(beacon_client).slots_per_epoch
 
 def get_seconds_to_handover_window(beacon_client):
     slot_in_epoch = get_slot_in_epoch(beacon_client)
     if slot_in_epoch < 28:
-        return (28 - slot_in_epoch) * int(beacon_client.get_spec()['data']['SECONDS_PER_SLOT'])
+        return (28 - slot_in_epoch) * get_beacon_spec(beacon_client).seconds_per_slot
     else:
         return 0
 
 def wait_for_tx_to_be_included(eth_client, tx_hash, timeout=10):
     try:
-        receipt = eth_client.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        ws_url = get_ws_url(eth_client)
+        if ws_url:
+            receipt = wait_for_receipt_subscription(eth_client, ws_url, tx_hash, timeout)
+            if receipt is None:
+                raise web3.exceptions.TimeExhausted(f"Transaction {tx_hash} is not in the chain after {timeout} seconds")
+        else:
+            receipt = eth_client.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout, poll_latency=get_poll_latency_sec(RECEIPT_POLL_LATENCY_SEC))
         if receipt.status == 1:
             return True
         else:
@@ -65,11 +310,51 @@ def wait_for_tx_to_be_included(eth_client, tx_hash, timeout=10):
         print(f"Error waiting for transaction to be included: {e}")
         return False
 
+def wait_for_txs_included(eth_client, tx_hashes, timeout, batch_size=10):
+    """
+    Wait for receipts of all tx_hashes, polling the outstanding ones with batched
+    eth_getTransactionReceipt calls. Returns True if all were included and succeeded.
+    """
+    pending = [HexBytes(tx_hash).to_0x_hex() for tx_hash in tx_hashes]
+    reverted = []
+
+    def poll():
+        still_pending = []
+        for i in range(0, len(pending), batch_size):
+            chunk = pending[i:i + batch_size]
+            # Raw batch so a missing receipt is a null result rather than an exception for the whole batch
+            responses = make_raw_batch_request(eth_client, [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk])
+            for tx_hash, response in zip(chunk, responses):
+                if "error" in response:
+                    raise RuntimeError(f"Failed to read receipt of {tx_hash}: {response['error']}")
+                receipt = response.get("result")
+                if receipt is None:
+                    still_pending.append(tx_hash)
+                elif int(receipt["status"], 16) != 1:
+                    reverted.append(tx_hash)
+        pending[:] = still_pending
+        return not pending
+
+    if not wait_until(poll, timeout, interval=get_poll_latency_sec()):
+        print(f"Error waiting for transactions to be included, still pending: {pending}")
+        return False
+    for tx_hash in reverted:
+        print(f"Transaction {tx_hash} reverted")
+    return not reverted
+
+def wait_for_receipt_subscription(eth_client, ws_url, tx_hash, timeout):
+    """Check for the receipt of tx_hash on every new head pushed through an eth_subscribe newHeads subscription"""
+    def handle(head):
+        try:
+            return eth_client.eth.get_transaction_receipt(tx_hash)
+        except web3.exceptions.TransactionNotFound:
+            return None
+
+    return watch_subscription(ws_url, "newHeads", None, handle, timeout)
+
 def wait_for_new_block(eth_client, initial_block_number):
-    for i in range(10):
-        if eth_client.eth.block_number > initial_block_number:
-            return True
-        time.sleep(1)
+    if wait_until(lambda: eth_client.eth.block_number > initial_block_number, 10, interval=get_poll_latency_sec()):
+        return True
     print(f"Error waited 10 seconds for new block, but block number did not increase")
     return False
 
@@ -84,13 +369,11 @@ def wait_for_next_slot(beacon_client):
 
 def wait_for_slot_beginning(beacon_client, desired_slot):
     slot_in_epoch = get_slot_in_epoch(beacon_client)
-    seconds_per_slot = int(beacon_client.get_spec()['data']['SECONDS_PER_SLOT'])
+    seconds_per_slot, number_of_slots_in_epoch = get_beacon_spec(beacon_client)
     print(f"Slot in epoch: {slot_in_epoch}")
-    number_of_slots_in_epoch = int(beacon_client.get_spec()['data']['SLOTS_PER_EPOCH'])
 
-    slots_to_wait = (number_of_slots_in_epoch - slot_in_epoch + desired_slot) % number_of_slots_in_epoch - 1
-    if slots_to_wait < 0:   # if we are in the desired slot, we need to wait for the next epoch
-        slots_to_wait = number_of_slots_in_epoch - 1
+    # Full slots left before the desired one; a whole epoch minus one if we are already in it
+    slots_to_wait = (desired_slot - slot_in_epoch - 1) % number_of_slots_in_epoch
     seconds_till_end_of_slot = seconds_per_slot - int(time.time()) % seconds_per_slot
 
     seconds_to_wait = seconds_till_end_of_slot + slots_to_wait * seconds_per_slot + 1  # +1 second to be sure we are in the next slot
@@ -101,9 +384,11 @@ def wait_for_slot_beginning(beacon_client, desired_slot):
 def spam_n_txs(eth_client, private_key, n):
     account = eth_client.eth.account.from_key(private_key)
     last_tx_hash = None
+    # Each tx is waited for before the next, so the nonce can be tracked locally
+    nonce = eth_client.eth.get_transaction_count(account.address)
+    tx_template = build_tx_template('0.00009', get_tx_fee_params(eth_client))
     for i in range(n):
-        nonce = eth_client.eth.get_transaction_count(account.address)
-        last_tx_hash = send_transaction(nonce, account, '0.00009', eth_client, private_key)
+        last_tx_hash = send_transaction(nonce + i, account, '0.00009', eth_client, private_key, tx_template)
         wait_for_tx_to_be_included(eth_client, last_tx_hash)
     return last_tx_hash
 
@@ -112,69 +397,149 @@ def spam_n_blocks(eth_client, private_key, n, preconf_min_txs):
     print(f"Spamming {n} blocks with {preconf_min_txs} transactions per block")
     account = eth_client.eth.account.from_key(private_key)
     last_tx_hash = None
+    nonce = eth_client.eth.get_transaction_count(account.address)
     for i in range(n):
-        nonce = eth_client.eth.get_transaction_count(account.address)
-        for j in range(preconf_min_txs):
-            last_tx_hash = send_transaction(nonce, account, '0.00009', eth_client, private_key)
-            nonce += 1
+        try:
+            last_tx_hash = send_n_signed_transactions(eth_client, account, nonce, preconf_min_txs, '0.00009')[-1]
+        except Exception as e:
+            # The local nonce only drifts if a send failed part way, resync from the pending pool and retry once
+            print(f"Resyncing nonce after send error: {e}")
+            nonce = eth_client.eth.get_transaction_count(account.address, 'pending')
+            last_tx_hash = send_n_signed_transactions(eth_client, account, nonce, preconf_min_txs, '0.00009')[-1]
+        nonce += preconf_min_txs
         wait_for_tx_to_be_included(eth_client, last_tx_hash)
     return last_tx_hash
 
+# spam_n_txs_wait_only_for_the_last re-reads the fee params once every this many paced sends
+PACED_SEND_FEE_REFRESH_TXS = 5
+
 def spam_n_txs_wait_only_for_the_last(eth_client, private_key, n, delay):
     account = eth_client.eth.account.from_key(private_key)
     last_tx_hash = None
     nonce = eth_client.eth.get_transaction_count(account.address)
+    # Sends run on the pool so the pacing delay is not stretched by each send's round trip
+    sends = []
     for i in range(n):
-        last_tx_hash = send_transaction(nonce+i, account, '0.00009', eth_client, private_key)
-        time.sleep(delay)
+        started = time.monotonic()
+        # The sends span several blocks, so re-read the fees periodically to follow base fee increases
+        if i % PACED_SEND_FEE_REFRESH_TXS == 0:
+            tx_template = build_tx_template('0.00009', get_tx_fee_params(eth_client))
+        raw_tx = sign_from_template(account, nonce + i, tx_template)
+        if LOG_SENDS:
+            print(f'RPC URL: {eth_client.provider.endpoint_uri}, Sending from: {account.address}, nonce: {nonce + i}, time: {utc_time_with_micros()}')
+        sends.append(submit_background(functools.partial(eth_client.eth.send_raw_transaction, raw_tx)))
+        time.sleep(max(0, delay - (time.monotonic() - started)))
+    for future in sends:
+        last_tx_hash = future.result()
+        if LOG_SENDS:
+            print(f'Transaction sent: {last_tx_hash.hex()}')
     wait_for_tx_to_be_included(eth_client, last_tx_hash)
 
 def send_n_txs_without_waiting(eth_client, private_key, n):
     account = eth_client.eth.account.from_key(private_key)
     nonce = eth_client.eth.get_transaction_count(account.address)
-    for i in range(n):
-        send_transaction(nonce+i, account, '0.00009', eth_client, private_key)
+    send_n_signed_transactions(eth_client, account, nonce, n, '0.00009')
 
 def wait_for_batch_proposed_event(eth_client, from_block, env_vars):
+    """
+    Wait for the next proposed event at or after from_block. from_block may be 'latest', which is
+    resolved by the first block number read of the wait instead of a separate round trip.
+    """
     print(f"Waiting for BatchProposed event from block {from_block}")
-    proposed_filter = get_proposed_event_filter(eth_client, from_block, env_vars)
-
     WAIT_TIME = 100
-    for i in range(WAIT_TIME):
-        new_entries = proposed_filter.get_all_entries()
-        if len(new_entries) > 0:
-            print(f"Got BatchProposed event after {i} seconds")
-            event = new_entries[-1]
-            print_batch_info(eth_client, event, env_vars)
-            return event
-        time.sleep(1)
-    assert False, "Warning waited {} seconds for BatchProposed event without getting one".format(WAIT_TIME)
+    ws_url = get_ws_url(eth_client)
+    if ws_url:
+        start_time = time.time()
+        event = wait_for_proposed_event_subscription(eth_client, ws_url, from_block, env_vars, WAIT_TIME)
+        assert event is not None, "Warning waited {} seconds for BatchProposed event without getting one".format(WAIT_TIME)
+        print(f"Got BatchProposed event after {int(time.time() - start_time)} seconds")
+        print_batch_info(eth_client, event, env_vars)
+        return event
 
-def get_proposed_event_filter(eth_client, from_block, env_vars):
+    proposed_event = get_proposed_event(eth_client, env_vars)
+    next_block = from_block
+    # Head block read by the previous poll, bounds the next getLogs window
+    latest_block = None
+    new_entries = []
+
+    def poll():
+        nonlocal next_block, latest_block, new_entries
+        if next_block != 'latest' and (latest_block is None or next_block > latest_block):
+            # Head not known yet or behind the cursor, there is nothing to scan until it catches up
+            latest_block = eth_client.eth.block_number
+            if next_block > latest_block:
+                return False
+        # One round trip per poll, the head read only moves the cursor for the next poll.
+        # Once the cursor is a number the range is capped at LOG_BATCH_SIZE blocks and at the known head
+        to_block = 'latest' if next_block == 'latest' else min(next_block + LOG_BATCH_SIZE - 1, latest_block)
+        with eth_client.batch_requests() as batch:
+            batch.add(eth_client.eth.block_number)
+            batch.add(eth_client.eth.get_logs({
+                "fromBlock": next_block,
+                "toBlock": to_block,
+                "address": proposed_event.address,
+                "topics": [proposed_event.topic],
+            }))
+            latest_block, logs = batch.execute()
+        new_entries = [proposed_event.process_log(log) for log in logs]
+        if next_block == 'latest':
+            next_block = latest_block
+        else:
+            # Move past a fully scanned window, but re-scan the head block in case the node served
+            # getLogs before the block that blockNumber reported
+            next_block = max(next_block, min(to_block + 1, latest_block))
+        return len(new_entries) > 0
+
+    start_time = time.time()
+    assert wait_until(poll, WAIT_TIME), "Warning waited {} seconds for BatchProposed event without getting one".format(WAIT_TIME)
+    print(f"Got BatchProposed event after {int(time.time() - start_time)} seconds")
+    event = new_entries[-1]
+    print_batch_info(eth_client, event, env_vars)
+    return event
+
+def wait_for_proposed_event_subscription(eth_client, ws_url, from_block, env_vars, timeout):
+    """Wait for the proposed event through an eth_subscribe logs subscription"""
+    proposed_event = get_proposed_event(eth_client, env_vars)
+
+    def handle(log):
+        if log is None:
+            # Catch up on events emitted between from_block and the subscription start
+            latest_block = eth_client.eth.block_number
+            start_block = latest_block if from_block == 'latest' else from_block
+            entries = get_proposed_event_logs(proposed_event, start_block, latest_block)
+            return entries[-1] if len(entries) > 0 else None
+        return proposed_event.process_log(log)
+
+    filter_params = {"address": proposed_event.address, "topics": [proposed_event.topic]}
+    return watch_subscription(ws_url, "logs", filter_params, handle, timeout)
+
+def get_proposed_event_logs(proposed_event, from_block, to_block):
+    """
+    Fetch proposed events in [from_block, to_block]. Each eth_getLogs is filtered on the inbox
+    address and event topic and spans at most LOG_BATCH_SIZE blocks.
+    """
+    entries = []
+    while from_block <= to_block:
+        window_end = min(from_block + LOG_BATCH_SIZE - 1, to_block)
+        entries.extend(proposed_event.get_logs(from_block=from_block, to_block=window_end))
+        from_block = window_end + 1
+    return entries
+
+def get_proposed_event(eth_client, env_vars):
     if env_vars.is_pacaya():
-        with open("../pacaya/src/l1/abi/ITaikoInbox.json") as f:
-            abi = json.load(f)
-        contract = eth_client.eth.contract(address=env_vars.taiko_inbox_address, abi=abi)
-        return contract.events.BatchProposed.create_filter(
-            from_block=from_block
-        )
+        contract = cached_contract(eth_client, env_vars.taiko_inbox_address, "ITaikoInbox")
+        return contract.events.BatchProposed
     elif env_vars.is_shasta():
-        proposed_event_abi = get_shasta_inbox_abi()
-        contract = eth_client.eth.contract(address=env_vars.taiko_inbox_address, abi=proposed_event_abi)
-        return contract.events.Proposed.create_filter(
-            from_block=from_block
-        )
+        contract = cached_contract(eth_client, env_vars.taiko_inbox_address, "ShastaInbox")
+        return contract.events.Proposed
     else:
         raise Exception("Invalid protocol")
 
+
 def wait_for_forced_inclusion_store_to_be_empty(l1_client, env_vars):
     TIMEOUT = 300
-    i = 0
-    while not forced_inclusion_store_is_empty(l1_client, env_vars):
-        if i >= TIMEOUT:
-            assert False, "Error: waited {} seconds for forced inclusion store to be empty".format(TIMEOUT)
-        time.sleep(1)
-        i += 1
+    assert wait_until(lambda: forced_inclusion_store_is_empty(l1_client, env_vars), TIMEOUT), \
+        "Error: waited {} seconds for forced inclusion store to be empty".format(TIMEOUT)
 
 def print_batch_info(l1_client, event, env_vars):
     print("BatchProposed event detected:")
@@ -194,52 +559,130 @@ def print_batch_info(l1_client, event, env_vars):
         print(f"  Block number: {event['blockNumber']}")
     print("---")
 
-def get_current_operator(eth_client, l1_contract_address):
-    with open("../pacaya/src/l1/abi/PreconfWhitelist.json") as f:
-        abi = json.load(f)
+@functools.lru_cache(maxsize=None)
+def load_pacaya_abi(name):
+    """ABI of a Pacaya L1 contract from pacaya/src/l1/abi, read from disk once per name"""
+    with open(f"../pacaya/src/l1/abi/{name}.json") as f:
+        return json.load(f)
+
+# ABIs that do not come from pacaya/src/l1/abi, by the name cached_contract is called with
+_CONTRACT_ABI_LOADERS = {
+    "ShastaInbox": lambda: get_shasta_inbox_abi(),
+    "PacayaForcedInclusionStore": lambda: pacaya_fi_abi,
+}
+
+@functools.lru_cache(maxsize=None)
+def cached_contract(eth_client, address, abi_name):
+    """
+    web3 contract built once per client, address and ABI name. abi_name is a Pacaya ABI file name
+    or one of the keys of _CONTRACT_ABI_LOADERS.
+    """
+    loader = _CONTRACT_ABI_LOADERS.get(abi_name)
+    abi = loader() if loader is not None else load_pacaya_abi(abi_name)
+    return eth_client.eth.contract(address=address, abi=abi)
+
+def _whitelist_contract(eth_client, l1_contract_address):
+    return cached_contract(eth_client, l1_contract_address, "PreconfWhitelist")
 
-    contract = eth_client.eth.contract(address=l1_contract_address, abi=abi)
+def get_current_operator(eth_client, l1_contract_address):
+    contract = _whitelist_contract(eth_client, l1_contract_address)
     return contract.functions.getOperatorForCurrentEpoch().call()
 
 def get_next_operator(eth_client, l1_contract_address):
-    import json
-    with open("../pacaya/src/l1/abi/PreconfWhitelist.json") as f:
-        abi = json.load(f)
-
-    contract = eth_client.eth.contract(address=l1_contract_address, abi=abi)
+    contract = _whitelist_contract(eth_client, l1_contract_address)
     return contract.functions.getOperatorForNextEpoch().call()
 
+def wait_for_operator_added_event(eth_client, ws_url, l1_contract_address, timeout):
+    """
+    Wait for an OperatorAdded event on the whitelist through an eth_subscribe logs subscription.
+    Returns the event, or True if an operator was already active when the subscription started.
+    """
+    operator_added = _whitelist_contract(eth_client, l1_contract_address).events.OperatorAdded
+
+    def handle(log):
+        if log is None:
+            # The operator may have been set between the last check and the subscription start
+            operator = get_current_operator(eth_client, l1_contract_address)
+            return True if operator != "0x0000000000000000000000000000000000000000" else None
+        return operator_added.process_log(log)
+
+    filter_params = {"address": operator_added.address, "topics": [operator_added.topic]}
+    return watch_subscription(ws_url, "logs", filter_params, handle, timeout)
+
 def spam_txs_until_new_batch_is_proposed(l1_eth_client, l2_eth_client, beacon_client, env_vars):
-    current_block = l1_eth_client.eth.block_number
-    l1_slot_duration = int(beacon_client.get_spec()['data']['SECONDS_PER_SLOT'])
+    next_block = l1_eth_client.eth.block_number
 
     number_of_blocks = 10
     for i in range(number_of_blocks):
-        spam_n_blocks(l2_eth_client, env_vars.l2_prefunded_priv_key, 1, env_vars.preconf_min_txs)
-        wait_till_next_l1_slot(beacon_client)
-        event = get_last_batch_proposed_event(l1_eth_client, current_block, env_vars)
+        # The slot wait is computed from the clock, so it can run while the L2 block is being produced
+        run_parallel(
+            lambda: spam_n_blocks(l2_eth_client, env_vars.l2_prefunded_priv_key, 1, env_vars.preconf_min_txs),
+            lambda: wait_till_next_l1_slot(beacon_client),
+        )
+        event, last_scanned = get_last_batch_proposed_event(l1_eth_client, next_block, env_vars)
         if event is not None:
             return event
+        next_block = last_scanned + 1
 
-    wait_for_batch_proposed_event(l1_eth_client, current_block, env_vars)
+    wait_for_batch_proposed_event(l1_eth_client, next_block, env_vars)
 
 def wait_till_next_l1_slot(beacon_client):
-    l1_slot_duration = int(beacon_client.get_spec()['data']['SECONDS_PER_SLOT'])
+    l1_slot_duration = get_beacon_spec(beacon_client).seconds_per_slot
     current_time = int(time.time()) % l1_slot_duration
     time.sleep(l1_slot_duration - current_time)
 
 def get_last_batch_proposed_event(eth_client, from_block, env_vars):
-    proposed_filter = get_proposed_event_filter(eth_client, from_block, env_vars)
-    new_entries = proposed_filter.get_all_entries()
+    """
+    Latest proposed event in [from_block, head], or None, together with the last block scanned.
+    Callers polling repeatedly pass last_scanned + 1 back in so each block is only fetched once.
+    """
+    latest_block = eth_client.eth.block_number
+    new_entries = get_proposed_event_logs(get_proposed_event(eth_client, env_vars), from_block, latest_block)
+    last_scanned = max(latest_block, from_block - 1)
     if len(new_entries) > 0:
         event = new_entries[-1]
         print_batch_info(eth_client, event, env_vars)
-        return event
-    return None
+        return event, last_scanned
+    return None, last_scanned
+
+# Nodes stopped by the tests, so teardown only has to restore those
+_stopped_catalyst_nodes = set()
+
+# Logged by the catalyst node once it is ready to preconfirm
+CATALYST_WARMUP_LOG = "Node warmup successful"
+# Unix time of the last restart_catalyst_node call per node
+_catalyst_node_restarted_at = {}
+
+def get_stopped_catalyst_nodes():
+    return sorted(_stopped_catalyst_nodes)
+
+@functools.lru_cache(maxsize=1)
+def _get_docker_client():
+    """Docker Engine API client, or None when the SDK or daemon socket is unavailable and the CLI is used"""
+    if docker_sdk is None:
+        return None
+    try:
+        return docker_sdk.from_env()
+    except docker_sdk.errors.DockerException as e:
+        print(f"Docker SDK unavailable, falling back to the docker CLI: {e}")
+        return None
+
+def _docker_sdk_container_action(client, action, container_name):
+    """Run stop/start/restart through the SDK, raising CalledProcessError like the CLI path on failure"""
+    try:
+        getattr(client.containers.get(container_name), action)()
+    except docker_sdk.errors.DockerException as e:
+        raise subprocess.CalledProcessError(1, ["docker", action, container_name], output="", stderr=str(e)) from e
 
 def stop_catalyst_node(node_number):
     container_name = choose_catalyst_node(node_number)
 
+    _stopped_catalyst_nodes.add(node_number)
+    client = _get_docker_client()
+    if client is not None:
+        _docker_sdk_container_action(client, "stop", container_name)
+        print(f"Stop {container_name}")
+        return
     result = subprocess.run(["docker", "stop", container_name], capture_output=True, text=True, check=True)
     print(f"Stop {result.stdout}")
     if result.stderr:
@@ -248,7 +691,14 @@ def stop_catalyst_node(node_number):
 def start_catalyst_node(node_number):
     container_name = choose_catalyst_node(node_number)
 
+    client = _get_docker_client()
+    if client is not None:
+        _docker_sdk_container_action(client, "start", container_name)
+        _stopped_catalyst_nodes.discard(node_number)
+        print(f"Start {container_name}")
+        return
     result = subprocess.run(["docker", "start", container_name], capture_output=True, text=True, check=True)
+    _stopped_catalyst_nodes.discard(node_number)
     print(f"Start {result.stdout}")
     if result.stderr:
         print(result.stderr)
@@ -256,19 +706,60 @@ def start_catalyst_node(node_number):
 def restart_catalyst_node(node_number):
     container_name = choose_catalyst_node(node_number)
 
+    # Whole seconds, as accepted by docker logs --since
+    _catalyst_node_restarted_at[node_number] = int(time.time())
+    client = _get_docker_client()
+    if client is not None:
+        _docker_sdk_container_action(client, "restart", container_name)
+        print(f"Restart {container_name}")
+        return
     result = subprocess.run(["docker", "restart", container_name], capture_output=True, text=True, check=True)
     print(f"Restart {result.stdout}")
     if result.stderr:
         print(result.stderr)
 
+def restart_catalyst_nodes(*node_numbers):
+    """Restart the given catalyst nodes concurrently, they are independent containers"""
+    run_parallel(*(functools.partial(restart_catalyst_node, node_number) for node_number in node_numbers))
+
+def is_catalyst_node_warmed_up(node_number):
+    """Whether the node logged a successful warmup since its last restart_catalyst_node"""
+    container_name = choose_catalyst_node(node_number)
+    since = _catalyst_node_restarted_at.get(node_number, 0)
+    client = _get_docker_client()
+    if client is not None:
+        logs = client.containers.get(container_name).logs(since=since).decode(errors="replace")
+        return CATALYST_WARMUP_LOG in logs
+    result = subprocess.run(["docker", "logs", "--since", str(since), container_name], capture_output=True, text=True)
+    return CATALYST_WARMUP_LOG in result.stdout or CATALYST_WARMUP_LOG in result.stderr
+
+def wait_for_catalyst_nodes_warmup(node_numbers, timeout):
+    """
+    Wait until every restarted node has finished its warmup, or timeout seconds pass.
+    The node has no readiness RPC, so this watches the container log for the warmup message.
+    """
+    start_time = time.time()
+    if wait_until(lambda: all(run_parallel(*(functools.partial(is_catalyst_node_warmed_up, n) for n in node_numbers))), timeout):
+        print(f"Catalyst nodes {node_numbers} warmed up after {int(time.time() - start_time)} seconds")
+    else:
+        print(f"Warning: catalyst nodes {node_numbers} did not report warmup within {timeout} seconds")
+
+_NODE_NAMES = {1: "catalyst-node-1", 2: "catalyst-node-2"}
+
 def choose_catalyst_node(node_number):
-    container_name = "catalyst-node-1" if node_number == 1 else "catalyst-node-2" if node_number == 2 else None
-    if container_name is None:
-        raise Exception("Invalid node number")
-    return container_name
+    try:
+        return _NODE_NAMES[node_number]
+    except KeyError:
+        raise Exception("Invalid node number") from None
 
 def is_catalyst_node_running(node_number):
     container_name = choose_catalyst_node(node_number)
+    client = _get_docker_client()
+    if client is not None:
+        try:
+            return client.containers.get(container_name).status == "running"
+        except docker_sdk.errors.NotFound:
+            return False
     try:
         result = subprocess.run(
             ["docker", "inspect", "-f", "{{.State.Running}}", container_name],
@@ -294,7 +785,7 @@ def get_current_operator_number(l1_client, l2_prefunded_priv_key, preconf_whitel
     return 1 if current_operator == account1.address else 2
 
 def get_slot_duration_sec(beacon_client):
-    return int(beacon_client.get_spec()['data']['SECONDS_PER_SLOT'])
+    return get_beacon_spec(beacon_client).seconds_per_slot
 
 def get_two_l2_slots_duration_sec(preconf_heartbeat_ms):
      return int(preconf_heartbeat_ms / 500) # preconf_heartbeat_ms / 1000 * 2
@@ -313,69 +804,66 @@ def wait_for_epoch_with_operator_switch_and_slot(beacon_client, l1_client, preco
     assert current_operator != next_operator, "Current operator should be different from next operator"
 
 def read_shasta_inbox_config(l1_client, shasta_inbox_address):
-    abi = get_shasta_inbox_abi()
-    contract = l1_client.eth.contract(address=shasta_inbox_address, abi=abi)
+    contract = cached_contract(l1_client, shasta_inbox_address, "ShastaInbox")
     config = contract.functions.getConfig().call()
     return config
 
+@functools.lru_cache(maxsize=1)
 def get_shasta_inbox_abi():
     commit = get_taiko_bindings_commit()
     url = f"https://raw.githubusercontent.com/taikoxyz/taiko-mono/{commit}/packages/taiko-client-rs/crates/bindings/src/inbox.rs"
     return read_json_abi_from_rust_bindings(url)
 
+@functools.lru_cache(maxsize=1)
 def get_taiko_bindings_commit():
     """Read the commit hash from Cargo.toml for taiko_bindings dependency"""
     cargo_toml_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Cargo.toml")
-    with open(cargo_toml_path, 'r') as f:
-        content = f.read()
-
-    # Find the taiko_bindings dependency and extract the rev value
-    pattern = r'taiko_bindings\s*=\s*\{[^}]*rev\s*=\s*"([^"]+)"'
-    match = re.search(pattern, content)
-
-    if not match:
+    with open(cargo_toml_path, 'rb') as f:
+        cargo = tomllib.load(f)
+    dependencies = cargo.get("workspace", {}).get("dependencies", {}) or cargo.get("dependencies", {})
+    rev = dependencies.get("taiko_bindings", {}).get("rev")
+    if not rev:
         raise ValueError("Could not find taiko_bindings rev in Cargo.toml")
-
-    return match.group(1)
+    return rev
 
 def read_json_abi_from_rust_bindings(url):
-    response = requests.get(url)
+    response = HTTP_SESSION.get(url, timeout=10)
     response.raise_for_status()  # Raise an exception for bad status codes
 
     content = response.text
 
-    # Find the ```json code block
-    pattern = r'```json\s*\n(.*?)\n```'
-    match = re.search(pattern, content, re.DOTALL)
-
-    if not match:
+    # Find the ```json code block: the line after the opening fence up to the next closing fence
+    start = content.find('```json')
+    body_start = content.find('\n', start) + 1 if start != -1 else 0
+    end = content.find('\n```', body_start) if body_start else -1
+    if end == -1:
         raise ValueError(f"Could not find ```json code block in the file at {url}")
 
-    json_content = match.group(1).strip()
+    json_content = content[body_start:end].strip()
 
     # Parse and return the JSON
     return json.loads(json_content)
 
-def get_forced_inclusion_store_head(l1_client, env_vars):
+def get_forced_inclusion_state(l1_client, env_vars):
+    """(head, tail) of the forced inclusion queue, read in a single round trip for both protocols"""
     if env_vars.is_pacaya():
-        contract = l1_client.eth.contract(address=env_vars.forced_inclusion_store_address, abi=pacaya_fi_abi)
-        head = contract.functions.head().call()
-        return int(head)
+        contract = cached_contract(l1_client, env_vars.forced_inclusion_store_address, "PacayaForcedInclusionStore")
+        with l1_client.batch_requests() as batch:
+            batch.add(contract.functions.head())
+            batch.add(contract.functions.tail())
+            head, tail = batch.execute()
     else:
-        shasta_abi = get_shasta_inbox_abi()
-        contract = l1_client.eth.contract(address=env_vars.forced_inclusion_store_address, abi=shasta_abi)
+        contract = cached_contract(l1_client, env_vars.forced_inclusion_store_address, "ShastaInbox")
         head, tail = contract.functions.getForcedInclusionState().call()
-        return int(head)
+    return int(head), int(tail)
+
+def get_forced_inclusion_store_head(l1_client, env_vars):
+    head, tail = get_forced_inclusion_state(l1_client, env_vars)
+    return head
 
 def forced_inclusion_store_is_empty(l1_client, env_vars):
-    if env_vars.is_pacaya():
-        contract = l1_client.eth.contract(address=env_vars.forced_inclusion_store_address, abi=pacaya_fi_abi)
-        head = contract.functions.head().call()
-        tail = contract.functions.tail().call()
-    else:
-        shasta_abi = get_shasta_inbox_abi()
-        contract = l1_client.eth.contract(address=env_vars.forced_inclusion_store_address, abi=shasta_abi)
-        head, tail = contract.functions.getForcedInclusionState().call()
+    head, tail = get_forced_inclusion_state(l1_client, env_vars)
+    if env_vars.is_shasta():
         print("Forced Inclusion head:", head, "tail: ", tail)
     return head == tail
 